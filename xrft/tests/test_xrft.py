@@ -283,6 +283,8 @@ def test_chunks_to_segments():
         da.chunk({"time": 16}), dim=["time"], shift=False, chunks_to_segments=True
     )
     assert ft.dims == ("time_segment", "freq_time", "y", "x")
+    # segments are batched together instead of being transformed one by one
+    assert ft.chunks[0] == (2,)
     data = da.chunk({"time": 16}).data.reshape((2, 16, N, N))
     npt.assert_almost_equal(ft.values, dsar.fft.fftn(data, axes=[1]), decimal=7)
     ft = xrft.fft(
@@ -338,6 +340,206 @@ def test_fft_nocoords():
     ps = xrft.power_spectrum(data, dim=["time"])
 
 
+def test_fft_backend(monkeypatch):
+    """Check that the scipy and numpy backends agree"""
+    da = xr.DataArray(
+        np.random.rand(8, 10, 12),
+        dims=["time", "y", "x"],
+        coords={"time": range(8), "y": range(10), "x": range(12)},
+    )
+    # the optional pyfftw is never selected by default
+    assert xrft.xrft._FFT_BACKEND == "scipy"
+    daft = xrft.fft(da, dim=["y", "x"])
+    rdaft = xrft.fft(da, dim=["y", "x"], real_dim="x")
+    monkeypatch.setattr(xrft.xrft, "_FFT_BACKEND", "numpy")
+    xrt.assert_allclose(xrft.fft(da, dim=["y", "x"]), daft)
+    xrt.assert_allclose(xrft.fft(da, dim=["y", "x"], real_dim="x"), rdaft)
+
+    with pytest.raises(ValueError):
+        xrft.set_fft_backend("fftpack")
+
+    monkeypatch.setattr(xrft.xrft, "pyfftw", None)
+    with pytest.raises(ImportError):
+        xrft.set_fft_backend("pyfftw")
+    monkeypatch.undo()
+
+    pytest.importorskip("pyfftw")
+    monkeypatch.setattr(xrft.xrft, "_FFT_BACKEND", "scipy")
+    monkeypatch.setattr(xrft.xrft, "_FFTW_PLANNER_EFFORT", "FFTW_ESTIMATE")
+    with pytest.raises(ValueError):
+        xrft.set_fft_backend("pyfftw", planner_effort="FFTW_QUICK")
+    xrft.set_fft_backend("pyfftw")
+    assert xrft.xrft._FFT_BACKEND == "pyfftw"
+    xrt.assert_allclose(xrft.fft(da, dim=["y", "x"]), daft)
+    xrt.assert_allclose(xrft.fft(da, dim=["y", "x"], real_dim="x"), rdaft)
+    # measured plans do not modify the input
+    xrft.set_fft_backend("pyfftw", planner_effort="FFTW_MEASURE")
+    expected = da.copy(deep=True)
+    for _ in range(2):
+        xrt.assert_allclose(xrft.fft(da, dim=["y", "x"], real_dim="x"), rdaft)
+    xrt.assert_identical(da, expected)
+
+
+def test_regular_coords():
+    """Check the coordinates flagged as regular"""
+    da = xr.DataArray(
+        np.random.rand(16, 12), dims=["y", "x"], coords={"y": range(16), "x": range(12)}
+    )
+    daft = xrft.fft(da)
+    assert daft.freq_x.attrs["xrft_regular"]
+    xrt.assert_allclose(xrft.ifft(daft).real, da)
+
+    # subsets keeping the attributes are still checked
+    with pytest.raises(ValueError, match="not evenly spaced"):
+        xrft.ifft(daft.isel(freq_x=[0, 1, 2, 4, 5, 6, 8]))
+
+
+def test_fft_cupy():
+    """Check that arrays on the GPU are transformed with cuFFT"""
+    cp = pytest.importorskip("cupy")
+    da = xr.DataArray(
+        np.random.rand(8, 10, 12),
+        dims=["time", "y", "x"],
+        coords={"time": range(8), "y": range(10), "x": range(12)},
+    )
+    for kwargs in [{}, {"real_dim": "x"}, {"true_phase": False}]:
+        daft = xrft.fft(da.copy(data=cp.asarray(da.data)), dim=["y", "x"], **kwargs)
+        assert isinstance(daft.data, cp.ndarray)
+        npt.assert_allclose(
+            cp.asnumpy(daft.data), xrft.fft(da, dim=["y", "x"], **kwargs).values
+        )
+
+
+def test_fft_dask_cupy():
+    """Check that dask arrays of GPU blocks are transformed with cuFFT"""
+    cp = pytest.importorskip("cupy")
+    da = xr.DataArray(
+        np.random.rand(8, 10, 12),
+        dims=["time", "y", "x"],
+        coords={"time": range(8), "y": range(10), "x": range(12)},
+    )
+    dag = da.copy(data=dsar.from_array(cp.asarray(da.data), chunks=(2, -1, -1)))
+    for kwargs in [{}, {"real_dim": "x"}, {"true_phase": False}]:
+        daft = xrft.fft(dag, dim=["y", "x"], **kwargs)
+        assert isinstance(daft.data._meta, cp.ndarray)
+        npt.assert_allclose(
+            cp.asnumpy(daft.data.compute()),
+            xrft.fft(da, dim=["y", "x"], **kwargs).values,
+        )
+
+
+def test_isotropic_ps_cupy():
+    """Check that spectra on the GPU are binned on the GPU"""
+    cp = pytest.importorskip("cupy")
+    da = xr.DataArray(
+        np.random.rand(2, 16, 20),
+        dims=["time", "y", "x"],
+        coords={"time": range(2), "y": range(16), "x": range(20)},
+    )
+    iso_ps = xrft.isotropic_power_spectrum(
+        da.copy(data=cp.asarray(da.data)), dim=["y", "x"]
+    )
+    assert isinstance(iso_ps.data, cp.ndarray)
+    npt.assert_allclose(
+        cp.asnumpy(iso_ps.data),
+        xrft.isotropic_power_spectrum(da, dim=["y", "x"]).values,
+    )
+
+
+def test_fft_leading_dims():
+    """Check transforms along leading, non-contiguous dimensions"""
+    da = xr.DataArray(
+        np.random.rand(8, 10, 12),
+        dims=["time", "y", "x"],
+        coords={"time": range(8), "y": range(10), "x": range(12)},
+    )
+    daft = xrft.fft(da, dim=["time", "y"], shift=False, true_phase=False)
+    assert daft.dims == ("freq_time", "freq_y", "x")
+    npt.assert_allclose(daft.values, np.fft.fftn(da.values, axes=[0, 1]))
+    daft = xrft.fft(da, dim=["time", "y"], real_dim="time", true_phase=False)
+    npt.assert_allclose(daft.values, np.fft.rfftn(da.values, axes=[1, 0]))
+
+
+@pytest.mark.parametrize("detrend", [None, "constant", "linear"])
+@pytest.mark.parametrize("window", [None, "hann"])
+@pytest.mark.parametrize("true_phase", [False, True])
+def test_fft_keeps_input(detrend, window, true_phase):
+    """Check that the transforms in place do not modify the input"""
+    da = xr.DataArray(
+        np.random.rand(10, 12), dims=["y", "x"], coords={"y": range(10), "x": range(12)}
+    )
+    expected = da.copy(deep=True)
+    xrft.fft(da, detrend=detrend, window=window, true_phase=true_phase)
+    xrft.fft(da, detrend=detrend, window=window, real_dim="x")
+    xrt.assert_identical(da, expected)
+
+
+@pytest.mark.parametrize("dtype", ["f8", "f4", "c16"])
+@pytest.mark.parametrize("nan", [False, True])
+def test_fft_detrend_window(dtype, nan):
+    """Check the constant detrend fused with the window of in-memory data"""
+    data = np.random.rand(3, 10, 12).astype(dtype)
+    if nan:
+        data[1, 2, 3] = np.nan
+    da = xr.DataArray(
+        data, dims=["t", "y", "x"], coords={"y": range(10), "x": range(12)}
+    )
+    # dask-backed data is detrended and windowed separately
+    expected = xrft.fft(da.chunk(), dim=["y", "x"], detrend="constant", window="hann")
+    daft = xrft.fft(da, dim=["y", "x"], detrend="constant", window="hann")
+    assert daft.dtype == expected.dtype
+    xrt.assert_allclose(daft, expected.compute(), rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("chunk", [False, True])
+def test_fft_output_coords(chunk):
+    """Check the coordinates and the name of the transform"""
+    da = xr.DataArray(
+        np.random.rand(3, 10, 12),
+        dims=["t", "y", "x"],
+        coords={
+            "t": range(3),
+            "y": range(10),
+            "x": range(12),
+            "lab": ("t", list("abc")),
+        },
+        name="v",
+    )
+    if chunk:
+        da = da.chunk({"t": 1})
+    daft = xrft.fft(da, dim=["y", "x"], real_dim="y")
+    assert daft.dims == ("t", "freq_y", "freq_x")
+    assert daft.name is None
+    assert set(daft.coords) == {"t", "lab", "freq_y", "freq_x"}
+    assert daft.freq_x.attrs["direct_lag"] == 6
+    assert daft.freq_y.attrs["xrft_regular"]
+    da2 = xrft.ifft(daft, dim=["freq_y", "freq_x"], real_dim="freq_y")
+    assert da2.dims == ("t", "y", "x")
+    assert da2.name is None
+    # auxiliary coordinates along the transformed dimensions are carried over
+    daft = daft.assign_coords(aux=("freq_x", np.arange(12), {"units": "m"}))
+    da2 = xrft.ifft(daft, dim=["freq_y", "freq_x"], real_dim="freq_y")
+    assert da2.aux.dims == ("x",)
+    assert da2.aux.attrs == {"units": "m"}
+    # in the order of the unshifted frequencies
+    npt.assert_array_equal(da2.aux, np.fft.ifftshift(np.arange(12)))
+
+
+@pytest.mark.parametrize("n", [10, 11])
+def test_fft_single_precision(n):
+    """Check that single precision data is transformed in single precision"""
+    da = xr.DataArray(
+        np.random.rand(n, 12), dims=["y", "x"], coords={"y": range(n), "x": range(12)}
+    )
+    expected = xrft.fft(da, window="hann")
+    daft = xrft.fft(da.astype("f4"), window="hann")
+    assert daft.dtype == np.complex64
+    npt.assert_allclose(daft.values, expected.values, rtol=1e-4, atol=1e-4)
+    daft = xrft.fft(da, window="hann", dtype="f4")
+    assert daft.dtype == np.complex64
+    npt.assert_allclose(daft.values, expected.values, rtol=1e-4, atol=1e-4)
+
+
 def test_window_single_dim():
     # Julius' example
     # https://github.com/rabernat/xrft/issues/16
@@ -596,6 +798,48 @@ class TestSpectrum(object):
         assert cs.dims == ("time", "freq_y", "x")
 
 
+def test_cross_spectrum_same_input(monkeypatch):
+    """Check that the cross spectrum of an array with itself transforms it once"""
+    da = xr.DataArray(
+        np.random.rand(8, 10), dims=["y", "x"], coords={"y": range(8), "x": range(10)}
+    ).chunk()
+    calls = []
+    fft = xrft.xrft.fft
+    monkeypatch.setattr(
+        xrft.xrft, "fft", lambda da, **kwargs: calls.append(da) or fft(da, **kwargs)
+    )
+    cs = xrft.cross_spectrum(da, da, dim=["y", "x"])
+    assert len(calls) == 1
+    xrt.assert_allclose(
+        cs, xrft.cross_spectrum(da.compute(), da.compute().copy(), dim=["y", "x"])
+    )
+    assert len(calls) == 3
+    xrft.isotropic_cross_spectrum(da, da, dim=["y", "x"])
+    assert len(calls) == 4
+
+
+@pytest.mark.parametrize("cross", [False, True])
+def test_spectral_product(monkeypatch, cross):
+    """Check the numba, numexpr and numpy spectral products against each other"""
+    f1 = np.random.rand(4, 6) + 1j * np.random.rand(4, 6)
+    f2 = np.random.rand(4, 6) + 1j * np.random.rand(4, 6) if cross else None
+    fac = np.random.rand(6)
+    expected = 3.0 * f1 * np.conj(f1 if f2 is None else f2) * fac
+    product = xrft.xrft._spectral_product(f1, f2, 3.0, [fac], [1])
+    npt.assert_allclose(product, expected if cross else expected.real)
+    if cross:
+        product = xrft.xrft._spectral_product(f1 * fac, f2, 3.0, [], [])
+        npt.assert_allclose(product, expected)
+        product = xrft.xrft._spectral_product(
+            f1.astype("c8"), f2.astype("c8"), 3.0, [], []
+        )
+        assert product.dtype == np.complex64
+    monkeypatch.setattr(xrft.xrft, "numexpr", None)
+    monkeypatch.setattr(xrft.xrft, "numba", None)
+    product = xrft.xrft._spectral_product(f1, f2, 3.0, [fac], [1])
+    npt.assert_allclose(product, expected if cross else expected.real)
+
+
 class TestCrossPhase(object):
     @pytest.mark.parametrize("dask", [False, True])
     def test_cross_phase_1d(self, dask):
@@ -981,6 +1225,56 @@ def test_isotropize(truncate, N=512):
     _test_iso(theta)
 
 
+@pytest.mark.parametrize("nbins", [100, 300])
+def test_radial_grid(nbins):
+    """Check that the cached radial bins are compact and read-only"""
+    k = np.arange(700.0).tobytes()
+    indices, counts = xrft.xrft._radial_grid(k, "<f8", k, "<f8", nbins, None)[:2]
+    assert indices.dtype == np.min_scalar_type(nbins)
+    assert not indices.flags.writeable
+    assert counts.sum() == indices.size == 700**2
+
+
+@pytest.mark.parametrize("complx", [False, True])
+@pytest.mark.parametrize("nthreads", [1, 8])
+def test_binned_mean(monkeypatch, complx, nthreads):
+    """Check the numba and numpy binning kernels against each other"""
+    numba = pytest.importorskip("numba")
+    monkeypatch.setattr(numba, "get_num_threads", lambda: nthreads)
+    ps = np.random.rand(3, 8, 10)
+    if complx:
+        ps = ps + 1j * np.random.rand(3, 8, 10)
+    freq_r = np.random.rand(8, 10)
+    indices, counts = xrft.xrft._radial_bins(freq_r, 4)
+    indices = indices.reshape(freq_r.shape)
+    expected = np.stack(
+        [
+            [ps[i].ravel()[indices.ravel() == b].mean() for b in range(4)]
+            for i in range(3)
+        ]
+    )
+    expected_power = np.stack(
+        [
+            [
+                (np.abs(ps[i].ravel()[indices.ravel() == b]) ** 2).mean()
+                for b in range(4)
+            ]
+            for i in range(3)
+        ]
+    )
+    scale = np.arange(1.0, 5.0)
+    for numba_kernel in [True, False]:
+        if not numba_kernel:
+            monkeypatch.setattr(xrft.xrft, "numba", None)
+        npt.assert_allclose(xrft.xrft._binned_mean(ps, indices, counts), expected)
+        npt.assert_allclose(
+            xrft.xrft._binned_mean(ps, indices, counts, scale), expected * scale
+        )
+        power = xrft.xrft._binned_mean(ps, indices, counts, power=True)
+        assert not np.iscomplexobj(power)
+        npt.assert_allclose(power, expected_power)
+
+
 @pytest.mark.parametrize("chunk", [False, True])
 def test_isotropic_ps_slope(chunk, N=512, dL=1.0, amp=1e1, s=-3.0):
     """Test the spectral slope of isotropic power spectrum."""
@@ -1020,6 +1314,82 @@ def test_isotropic_ps_slope(chunk, N=512, dL=1.0, amp=1e1, s=-3.0):
     npt.assert_almost_equal(iso_ps.values, iso_ps_sequal.mean(axis=0))
 
 
+@pytest.mark.parametrize("nx", [16, 17])
+@pytest.mark.parametrize("truncate", [False, True])
+def test_isotropic_ps_half_spectrum(nx, truncate):
+    """Check the half spectrum of real data against the full spectrum"""
+    da = xr.DataArray(
+        np.random.rand(2, 20, nx),
+        dims=["time", "y", "x"],
+        coords={"time": range(2), "y": range(20), "x": np.arange(nx) * 0.5},
+    )
+    kwargs = dict(dim=["y", "x"], window="hann", truncate=truncate)
+    iso_ps = xrft.isotropic_power_spectrum(da, **kwargs)
+    expected = xrft.isotropic_power_spectrum(da.astype(complex), **kwargs)
+    assert iso_ps.dtype == np.float64
+    xrt.assert_allclose(iso_ps, expected)
+
+
+@pytest.mark.parametrize("nx, chunk", [(32, 8), (30, 15)])
+@pytest.mark.parametrize("truncate", [False, True])
+def test_isotropic_ps_half_spectrum_segments(nx, chunk, truncate):
+    """Check the half spectrum of real data transformed by segments"""
+    da = xr.DataArray(
+        np.random.rand(16, nx),
+        dims=["y", "x"],
+        coords={"y": range(16), "x": np.arange(nx) * 0.5},
+    ).chunk({"x": chunk})
+    kwargs = dict(dim=["y", "x"], chunks_to_segments=True, truncate=truncate)
+    iso_ps = xrft.isotropic_power_spectrum(da, **kwargs)
+    expected = xrft.isotropic_power_spectrum(da.astype(complex), **kwargs)
+    assert iso_ps.sizes == expected.sizes
+    xrt.assert_allclose(iso_ps, expected)
+
+
+@pytest.mark.parametrize("chunk", [False, True])
+def test_isotropic_spectra_single_precision(chunk):
+    """Check that single precision data gives single precision spectra"""
+    da = xr.DataArray(
+        np.random.rand(2, 20, 16),
+        dims=["time", "y", "x"],
+        coords={"time": range(2), "y": range(20), "x": range(16)},
+    )
+    da32 = da.astype("f4")
+    if chunk:
+        da32 = da32.chunk({"time": 1})
+    kwargs = dict(dim=["y", "x"], window="hann", detrend="linear")
+    iso_ps = xrft.isotropic_power_spectrum(da32, **kwargs)
+    assert iso_ps.dtype == np.float32
+    npt.assert_allclose(
+        iso_ps.values, xrft.isotropic_power_spectrum(da, **kwargs).values, rtol=1e-4
+    )
+    iso_cs = xrft.isotropic_cross_spectrum(da32, da32, **kwargs)
+    assert iso_cs.dtype == np.complex64
+    npt.assert_allclose(
+        iso_cs.values,
+        xrft.isotropic_cross_spectrum(da, da, **kwargs).values,
+        rtol=1e-4,
+        atol=1e-6,
+    )
+
+
+def test_fit_loglog():
+    x = np.linspace(1, 10, 20)
+    y = 3 * x**-2.5 * (1 + 0.1 * np.random.rand(20))
+    y_fit, a, b = xrft.fit_loglog(x, y)
+    p = np.polyfit(np.log2(x), np.log2(y), 1)
+    npt.assert_allclose([a, b], p)
+    npt.assert_allclose(y_fit, 2 ** (np.log2(x) * p[0] + p[1]))
+
+    # DataArrays, e.g. an isotropic spectrum and its wavenumbers, are accepted
+    da = xr.DataArray(y, dims=["freq_r"], coords={"freq_r": x})
+    da_fit, da_a, da_b = xrft.fit_loglog(da.freq_r, da)
+    assert isinstance(da_a, float) and isinstance(da_b, float)
+    npt.assert_allclose([da_a, da_b], p)
+    assert da_fit.dims == ("freq_r",)
+    npt.assert_allclose(da_fit, y_fit)
+
+
 @pytest.mark.parametrize("chunk", [False, True])
 def test_isotropic_ps(chunk):
     """Test data with extra coordinates"""
@@ -1043,6 +1413,12 @@ def test_isotropic_ps(chunk):
     iso_ps = xrft.isotropic_power_spectrum(da, dim=["y", "x"])
     npt.assert_equal(np.ma.masked_invalid(iso_ps).mask.sum(), 0.0)
 
+    if chunk:
+        # chunks along the transformed dimensions are merged
+        xrt.assert_allclose(
+            xrft.isotropic_power_spectrum(da.chunk({"x": 8}), dim=["y", "x"]), iso_ps
+        )
+
 
 @pytest.mark.parametrize("chunk", [False, True])
 def test_isotropic_cs(chunk):
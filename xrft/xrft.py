@@ -1,6 +1,9 @@
+import os
 import warnings
 import operator
 import sys
+import weakref
+import contextlib
 import functools as ft
 from functools import reduce
 
@@ -9,11 +12,27 @@ import xarray as xr
 import pandas as pd
 
 import dask.array as dsar
-from dask import delayed
 
+import scipy.fft as sp_fft
 import scipy.signal as sps
 import scipy.linalg as spl
 
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft
+except ImportError:
+    pyfftw = None
+
 from .detrend import detrend as _detrend
 from pandas.api.types import is_numeric_dtype, is_datetime64_any_dtype
 
@@ -29,18 +48,208 @@ __all__ = [
     "isotropic_power_spectrum",
     "isotropic_cross_spectrum",
     "fit_loglog",
+    "set_fft_backend",
 ]
 
 
+# Backend used for in-memory arrays and the blocks of dask arrays, one of
+# "scipy", "numpy" or "pyfftw". "numpy" only applies to in-memory arrays.
+_FFT_BACKEND = "scipy"
+_FFT_BACKENDS = ["scipy", "numpy", "pyfftw"]
+# planning effort of FFTW for in-memory arrays
+_FFTW_PLANNER_EFFORT = "FFTW_ESTIMATE"
+_FFTW_PLANNER_EFFORTS = [
+    "FFTW_ESTIMATE",
+    "FFTW_MEASURE",
+    "FFTW_PATIENT",
+    "FFTW_EXHAUSTIVE",
+]
+
+
+def set_fft_backend(backend, planner_effort="FFTW_ESTIMATE"):
+    """
+    Select the library used to Fourier transform in-memory arrays.
+
+    The blocks of dask arrays are transformed with `scipy.fft`, or with FFTW through
+    `scipy.fft` if `pyfftw` is selected.
+    CuPy arrays are always transformed on the GPU with `cupyx.scipy.fft`.
+
+    The default backend is `scipy`. The backend only applies within xrft: the
+    global backend of `scipy.fft` is left unchanged.
+
+    Parameters
+    ----------
+    backend : {'scipy', 'numpy', 'pyfftw'}
+        If `scipy`, transforms are computed with `scipy.fft` using all
+        available cores.
+        If `numpy`, transforms are computed with `numpy.fft`.
+        If `pyfftw`, `scipy.fft` dispatches to FFTW through `pyfftw`.
+        This requires the optional `pyfftw` package.
+    planner_effort : {'FFTW_ESTIMATE', 'FFTW_MEASURE', 'FFTW_PATIENT', 'FFTW_EXHAUSTIVE'}
+        How hard FFTW looks for a fast plan of the transforms of in-memory arrays,
+        if `pyfftw` is selected. Plans other than `FFTW_ESTIMATE` are timed,
+        which is slow the first time a transform of a given shape is taken but
+        not afterwards, as FFTW remembers them for the rest of the session.
+    """
+    global _FFT_BACKEND, _FFTW_PLANNER_EFFORT
+
+    if backend not in _FFT_BACKENDS:
+        raise ValueError(
+            "Unknown FFT backend %s. Please use one of %s." % (backend, _FFT_BACKENDS)
+        )
+    if planner_effort not in _FFTW_PLANNER_EFFORTS:
+        raise ValueError(
+            "Unknown FFTW planner effort %s. Please use one of %s."
+            % (planner_effort, _FFTW_PLANNER_EFFORTS)
+        )
+    if backend == "pyfftw":
+        if pyfftw is None:
+            raise ImportError(
+                "The pyfftw backend requires the `pyfftw` package to be installed. Please install it with pip or conda."
+            )
+        # keep the plans of the transforms of dask blocks between calls
+        pyfftw.interfaces.cache.enable()
+    _FFT_BACKEND = backend
+    _FFTW_PLANNER_EFFORT = planner_effort
+
+
+def _is_cupy(x):
+    return type(x).__module__.split(".")[0] == "cupy"
+
+
 def _fft_module(da):
-    if da.chunks:
+    if da.chunks is not None:
         return dsar.fft
-    else:
+    elif _is_cupy(da.data):
+        # arrays on the GPU are transformed with cuFFT
+        import cupyx.scipy.fft
+
+        return cupyx.scipy.fft
+    elif _FFT_BACKEND == "numpy":
         return np.fft
+    else:
+        return sp_fft
 
 
-def _apply_window(da, dims, window_type="hann"):
-    """Creating windows in dimensions dims."""
+def _fft_kwargs(fftm, overwrite_x=False):
+    """Extra keyword arguments understood by the transforms of ``fftm``."""
+    if fftm is sp_fft:
+        # scipy.fft can spread multi-dimensional transforms over all cores
+        return {"workers": -1, "overwrite_x": overwrite_x}
+    return {}
+
+
+def _transform(fftm, name, x, axes, **kwargs):
+    """
+    Apply the transform ``name`` of ``fftm``, e.g. "rfftn", along ``axes``.
+    Transforms along one or two axes call the 1D or 2D functions directly,
+    which skip the dispatch overhead of the n-dimensional ones.
+    """
+    if not axes:
+        return x
+    elif len(axes) == 1:
+        return getattr(fftm, name[:-1])(x, axis=axes[0], **kwargs)
+    elif len(axes) == 2:
+        return getattr(fftm, name[:-1] + "2")(x, axes=axes, **kwargs)
+    return getattr(fftm, name)(x, axes=axes, **kwargs)
+
+
+def _fftw_transform(name, x, axes, **kwargs):
+    """
+    Apply the transform ``name`` along ``axes`` of the in-memory array ``x``
+    with FFTW. The plan only lives for this call, so that its arrays are freed
+    with it, and its output array is returned as is. FFTW keeps what it learns
+    while measuring plans as wisdom, from which the plans of the same transform
+    are built again without measuring. The keyword arguments of scipy.fft are
+    ignored.
+    """
+    if not axes:
+        return x
+    plan = getattr(pyfftw.builders, name)(
+        x, axes=axes, planner_effort=_FFTW_PLANNER_EFFORT, threads=os.cpu_count()
+    )
+    return plan()
+
+
+def _transform_trailing(fft_fn, x, axes, **kwargs):
+    """
+    Apply ``fft_fn`` with the transformed axes moved last and contiguous in
+    memory, which is the fastest layout for multi-dimensional transforms.
+    The output axes are returned in their original order.
+    """
+    trailing = list(range(x.ndim - len(axes), x.ndim))
+    if list(axes) == trailing:
+        return fft_fn(x, axes=axes, **kwargs)
+    x = np.ascontiguousarray(np.moveaxis(x, axes, trailing))
+    f = fft_fn(x, axes=trailing, **kwargs)
+    return np.moveaxis(f, trailing, axes)
+
+
+def _transform_blocks(name, x, axes, **kwargs):
+    """
+    Apply the transform ``name``, e.g. "rfftn", to every block of the dask
+    array ``x``, which must have a single chunk along ``axes``. dask
+    parallelizes over the blocks, so each block is transformed on a single
+    worker. Blocks on the GPU are transformed with cuFFT.
+    """
+    for ax in axes:
+        if len(x.chunks[ax]) != 1:
+            raise ValueError(
+                "Dask array only supports taking an FFT along an axis that has a single chunk. "
+                "An FFT operation was tried on axis %s which has chunks %s. "
+                "To change the array's chunks use dask.Array.rechunk."
+                % (ax, x.chunks[ax])
+            )
+    if not axes:
+        return x
+
+    if _is_cupy(x._meta):
+        import cupy
+        import cupyx.scipy.fft
+
+        xp, fftm, block_kwargs = cupy, cupyx.scipy.fft, {}
+    else:
+        xp, fftm, block_kwargs = np, sp_fft, {"workers": 1}
+
+    def _transform_block(block):
+        with _fft_backend_context(fftm):
+            return _transform(fftm, name, block, axes, **block_kwargs, **kwargs)
+
+    # a single transform gives the output length along axes and the output dtype
+    sample = _transform(
+        fftm,
+        name,
+        xp.zeros([n if i in axes else 1 for i, n in enumerate(x.shape)], x.dtype),
+        axes,
+    )
+    chunks = [(sample.shape[i],) if i in axes else c for i, c in enumerate(x.chunks)]
+    return x.map_blocks(
+        _transform_block, dtype=sample.dtype, chunks=chunks, meta=sample[:0]
+    )
+
+
+def _fft_function(da, name):
+    """The transform ``name``, e.g. "rfftn", to apply to the data of ``da``."""
+    if da.chunks is not None:
+        return ft.partial(_transform_blocks, name)
+    elif _is_cupy(da.data):
+        return ft.partial(_transform, _fft_module(da), name)
+    elif _FFT_BACKEND == "pyfftw":
+        return ft.partial(_transform_trailing, ft.partial(_fftw_transform, name))
+    return ft.partial(
+        _transform_trailing, ft.partial(_transform, _fft_module(da), name)
+    )
+
+
+def _fft_backend_context(fftm):
+    """Context in which the transforms of ``fftm`` run on the selected backend."""
+    if fftm is sp_fft and _FFT_BACKEND == "pyfftw":
+        return sp_fft.set_backend(pyfftw.interfaces.scipy_fft)
+    return contextlib.nullcontext()
+
+
+def _windows(da, dims, window_type="hann"):
+    """Creating 1D windows along each of the dimensions dims."""
 
     if window_type == True:
         window_type = "hann"
@@ -83,27 +292,36 @@ def _apply_window(da, dims, window_type="hann"):
         if isinstance(dims, str):
             dims = [dims]
 
-    scipy_win_func = getattr(sps.windows, window_type)
+    win_func = getattr(sps.windows, window_type)
 
-    if da.chunks:
-
-        def dask_win_func(n, sym=False):
-            return dsar.from_delayed(
-                delayed(scipy_win_func, pure=True)(n, sym=sym), (n,), float
-            )
+    return dims, [win_func(len(da[d]), sym=False) for d in dims]
 
-        win_func = dask_win_func
-    else:
-        win_func = scipy_win_func
 
-    windows = [
-        xr.DataArray(
-            win_func(len(da[d]), sym=False), dims=da[d].dims, coords=da[d].coords
+def _window_data(da, dims, windows, copy=True, offset=None):
+    """
+    Multiply da by the 1D windows along dims. The windows are applied one after
+    the other to the data instead of being broadcast against each other first.
+    Unless copy is True, in-memory data is windowed in place. If given, offset
+    is subtracted from the data first, see _multiply_along_axes.
+    """
+    return da.copy(
+        data=_multiply_along_axes(
+            da.data, windows, da.get_axis_num(dims), copy=copy, offset=offset
         )
-        for d in dims
-    ]
+    )
+
 
-    return reduce(operator.mul, windows[::-1]), da * reduce(operator.mul, windows[::-1])
+def _apply_window(da, dims, window_type="hann"):
+    """Creating windows in dimensions dims."""
+    dims, windows = _windows(da, dims, window_type=window_type)
+    window = reduce(
+        operator.mul,
+        [
+            xr.DataArray(w, dims=da[d].dims, coords=da[d].coords)
+            for d, w in zip(dims, windows)
+        ][::-1],
+    )
+    return window, _window_data(da, dims, windows)
 
 
 def _stack_chunks(da, dim, suffix="_segment"):
@@ -136,13 +354,33 @@ def _stack_chunks(da, dim, suffix="_segment"):
         data.reshape(newshape), dims=newdims, coords=newcoords, attrs=attr
     )
 
+    # reshaping leaves one segment per block; merge segments into larger blocks
+    # so that each task transforms a whole batch of segments in a single call
+    da = da.chunk({d + suffix: "auto" for d in dim})
+
     return da
 
 
 def _freq(N, delta_x, real, shift):
+    return list(_cached_freq(tuple(N), tuple(delta_x), real is not None, shift))
+
+
+def _ifreq(N, delta_x, real, shift):
+    return list(_cached_ifreq(tuple(N), tuple(delta_x), real is not None, shift))
+
+
+def _read_only(k):
+    # frequencies are cached and shared between calls, so they must not change
+    for l in k:
+        l.flags.writeable = False
+    return tuple(k)
+
+
+@ft.lru_cache(maxsize=256)
+def _cached_freq(N, delta_x, real, shift):
     # calculate frequencies from coordinates
     # coordinates are always loaded eagerly, so we use numpy
-    if real is None:
+    if not real:
         fftfreq = [np.fft.fftfreq] * len(N)
     else:
         # Discard negative frequencies from transform along last axis to be
@@ -155,13 +393,14 @@ def _freq(N, delta_x, real, shift):
     if shift:
         k = [np.fft.fftshift(l) for l in k]
 
-    return k
+    return _read_only(k)
 
 
-def _ifreq(N, delta_x, real, shift):
+@ft.lru_cache(maxsize=256)
+def _cached_ifreq(N, delta_x, real, shift):
     # calculate frequencies from coordinates
     # coordinates are always loaded eagerly, so we use numpy
-    if real is None:
+    if not real:
         fftfreq = [np.fft.fftfreq] * len(N)
     else:
         irfftfreq = lambda Nx, dx: np.fft.fftfreq(
@@ -175,7 +414,112 @@ def _ifreq(N, delta_x, real, shift):
     if shift:
         k = [np.fft.fftshift(l) for l in k]
 
-    return k
+    return _read_only(k)
+
+
+def _half_roll_factor(n, size=None):
+    """
+    Factor relating the DFTs of a length ``n`` signal before and after rolling
+    it by ``n // 2`` samples, i.e. ``exp(2j * pi * j * (n // 2) / n)`` for the
+    first ``size`` (default ``n``) indices ``j``.
+    For even ``n`` this is exactly ``(-1) ** j``.
+    """
+    j = np.arange(n if size is None else size)
+    if n % 2 == 0:
+        return (1 - 2 * (j % 2)).astype(np.int8)
+    return np.exp(2j * np.pi * j * (n // 2) / n)
+
+
+@ft.lru_cache(maxsize=256)
+def _phase_ramp(n, delta_x, lag, shift, real):
+    """
+    Phase factor of the Fourier transform along an axis of ``n`` samples
+    spaced by ``delta_x`` and starting at ``lag``, including the factors of
+    the shifts. The returned array is read-only.
+    """
+    k = _cached_freq((n,), (delta_x,), real, shift)[0]
+    phase = _half_roll_factor(n, len(k)) * np.exp(-1j * 2.0 * np.pi * k * lag)
+    if shift:
+        phase *= np.conj(_half_roll_factor(n)[n // 2])
+    return _read_only([phase])[0]
+
+
+@ft.lru_cache(maxsize=256)
+def _inverse_phase_ramp(k, dtype, lag):
+    """
+    Phase factor of the inverse Fourier transform along the frequencies ``k``,
+    given as the bytes of an array of type ``dtype``. The returned array is
+    read-only.
+    """
+    k = np.frombuffer(k, dtype=dtype)
+    return _read_only([np.exp(1j * 2.0 * np.pi * k * lag)])[0]
+
+
+def _match_precision(fac, dtype):
+    """Cast the array ``fac`` to the floating point precision of ``dtype``."""
+    real = np.finfo(dtype).dtype
+    if np.iscomplexobj(fac):
+        return fac.astype(np.result_type(real, np.complex64), copy=False)
+    return fac.astype(real, copy=False)
+
+
+def _multiply_along_axes(x, factors, axes, copy=True, offset=None):
+    """
+    Multiply ``x`` by the 1D arrays ``factors`` broadcast along ``axes``.
+    The factors never promote the floating point precision of ``x``, so that
+    single precision data stays in single precision.
+    Unless ``copy`` is True, in-memory arrays are updated in place whenever the
+    product keeps their dtype.
+    If given, the array ``offset``, which broadcasts against ``x``, is
+    subtracted from ``x`` within the same pass.
+    """
+    if np.issubdtype(x.dtype, np.inexact):
+        factors = [_match_precision(np.asarray(fac), x.dtype) for fac in factors]
+        if offset is not None:
+            offset = _match_precision(np.asarray(offset), x.dtype)
+    factors = [
+        np.reshape(fac, [-1 if i == ax else 1 for i in range(x.ndim)])
+        for fac, ax in zip(factors, axes)
+    ]
+    if not factors and offset is None:
+        return x.copy() if copy else x
+    if _is_cupy(getattr(x, "_meta", x)):
+        # factors are built on the host and must be moved to the device
+        import cupy
+
+        factors = [cupy.asarray(fac) for fac in factors]
+    dtype = np.result_type(x.dtype, *[fac.dtype for fac in factors])
+    inplace = not copy and isinstance(x, np.ndarray) and dtype == x.dtype
+
+    if (
+        numexpr is not None
+        and isinstance(x, np.ndarray)
+        and dtype in [np.float64, np.complex128]
+    ):
+        # numexpr fuses the offset and all the products into a single pass over x
+        names = ["f%d" % i for i in range(len(factors))]
+        local_dict = {n: fac.astype(dtype) for n, fac in zip(names, factors)}
+        local_dict["x"] = x
+        terms = ["x"]
+        if offset is not None:
+            local_dict["m"] = offset.astype(dtype)
+            terms = ["(x - m)"]
+        return numexpr.evaluate(
+            " * ".join(terms + names),
+            local_dict=local_dict,
+            out=x if inplace else None,
+        )
+
+    if offset is not None:
+        x = x - offset
+        inplace = isinstance(x, np.ndarray)
+    for fac in factors:
+        if inplace and np.result_type(x.dtype, fac.dtype) == x.dtype:
+            x *= fac
+        else:
+            x = x * fac
+            inplace = isinstance(x, np.ndarray)
+    return x
 
 
 def _new_dims_and_coords(da, dim, wavenm, prefix):
@@ -187,14 +531,35 @@ def _new_dims_and_coords(da, dim, wavenm, prefix):
     for d in dim:
         k = wavenm[d]
         new_name = prefix + d if d[: len(prefix)] != prefix else d[len(prefix) :]
-        new_dim = xr.DataArray(k, dims=new_name, coords={new_name: k}, name=new_name)
-        new_dim.attrs.update({"spacing": k[1] - k[0]})
-        new_coords[new_name] = new_dim
+        new_coords[new_name] = xr.Variable(
+            new_name, k, {"spacing": k[1] - k[0], "xrft_regular": True}
+        )
         swap_dims[d] = new_name
 
     return new_coords, swap_dims
 
 
+def _wrap_transform(f, da, dim, new_coords, swap_dims):
+    """
+    Wrap the transform f of da in a DataArray in a single step, with the
+    dimensions in dim swapped for the transformed ones and their coordinates.
+    The other coordinates along dim are carried over to the transformed
+    dimensions, as with DataArray.swap_dims.
+    """
+    coords = {
+        name: xr.Variable(
+            [swap_dims.get(d, d) for d in c.dims], c.data, c.attrs, c.encoding
+        )
+        for name, c in da.coords.items()
+        if name not in dim
+    }
+    coords.update(new_coords)
+    # f is wrapped in a Variable first, as the name of a dask array is its key
+    return xr.DataArray(
+        xr.Variable([swap_dims.get(d, d) for d in da.dims], f), coords=coords
+    )
+
+
 def _diff_coord(coord):
     """Returns the difference as a xarray.DataArray."""
 
@@ -292,7 +657,8 @@ def move_to_end(lst, el):
 def _get_coordinate_spacing(coord, spacing_tol):
     diff = _diff_coord(coord)
     delta = np.abs(diff[0])
-    if not np.allclose(diff, diff[0], rtol=spacing_tol):
+    # same test as np.allclose(diff, diff[0], rtol=spacing_tol), in fewer passes
+    if not np.abs(diff - diff[0]).max() <= 1e-8 + spacing_tol * delta:
         raise ValueError(
             "Can't take Fourier transform because "
             "coodinate %s is not evenly spaced" % coord.name
@@ -305,6 +671,36 @@ def _get_coordinate_spacing(coord, spacing_tol):
     return delta
 
 
+# Spacing and lag of recently transformed coordinates, keyed on the identity of
+# their values so that repeated transforms of the same grid skip the O(N) checks
+_coord_cache = {}
+
+
+def _coordinate_spacing_and_lag(coord, spacing_tol):
+    values = coord.values
+    if coord.attrs.get("xrft_regular") and "spacing" in coord.attrs:
+        # coordinates flagged as regular, e.g. the output of fft, are not
+        # checked element by element. Their end points must still agree with
+        # the spacing, which catches subsets that kept the attributes.
+        delta = np.abs(coord.attrs["spacing"])
+        extent = np.abs(values[-1] - values[0])
+        if is_numeric_dtype(values) and np.isclose(
+            extent, delta * (values.size - 1), rtol=spacing_tol
+        ):
+            return delta, _lag_coord(coord)
+    key = (id(values), spacing_tol)
+    # guards against values modified in place since they were cached
+    fingerprint = (values.size, values[0], values[1 % values.size], values[-1])
+    cached = _coord_cache.get(key)
+    if cached is not None and cached[0]() is values and cached[1] == fingerprint:
+        return cached[2]
+
+    result = _get_coordinate_spacing(coord, spacing_tol), _lag_coord(coord)
+    ref = weakref.ref(values, lambda _, key=key: _coord_cache.pop(key, None))
+    _coord_cache[key] = (ref, fingerprint, result)
+    return result
+
+
 def fft(
     da,
     spacing_tol=1e-3,
@@ -317,6 +713,7 @@ def fft(
     true_amplitude=True,
     chunks_to_segments=False,
     prefix="freq_",
+    dtype=None,
     **kwargs,
 ):
     """
@@ -362,6 +759,9 @@ def fft(
         Whether the data is chunked along the axis to take FFT.
     prefix : str
         The prefix for the new transformed dimensions.
+    dtype : str or numpy.dtype, optional
+        The data is cast to this dtype before being transformed, e.g. `float32`
+        to compute the Fourier transform in single precision (`complex64`).
 
     Returns
     -------
@@ -374,6 +774,9 @@ def fft(
         if isinstance(dim, str):
             dim = [dim]
 
+    if dtype is not None:
+        da = da.astype(dtype, copy=False)
+
     if "real" in kwargs:
         real_dim = kwargs.get("real")
         warnings.warn(_real_flag_warning, FutureWarning)
@@ -393,16 +796,16 @@ def fft(
 
     rawdims = da.dims  # take care of segmented dimesions, if any
 
-    if real_dim is not None:
+    if real_dim is not None and da.dims[-1] != real_dim:
         da = da.transpose(*move_to_end(da.dims, real_dim))
 
     fftm = _fft_module(da)
 
     if real_dim is None:
-        fft_fn = fftm.fftn
+        fft_fn = _fft_function(da, "fftn")
     else:
         shift = False
-        fft_fn = fftm.rfftn
+        fft_fn = _fft_function(da, "rfftn")
 
     # the axes along which to take ffts
     axis_num = [da.get_axis_num(d) for d in dim]
@@ -420,61 +823,97 @@ def fft(
                 f"Please drop these coordinates (`.drop({bad_coords}`) before invoking xrft."
             )
 
-    delta_x = [_get_coordinate_spacing(da[d], spacing_tol) for d in dim]
-    lag_x = [_lag_coord(da[d]) for d in dim]
-
-    if detrend is not None:
+    delta_x, lag_x = [], []
+    for d in dim:
+        delta, lag = _coordinate_spacing_and_lag(da[d], spacing_tol)
+        delta_x.append(delta)
+        lag_x.append(lag)
+
+    # Once detrended or windowed, the data is a copy which the window, the
+    # modulation and the transform itself can overwrite.
+    owned = False
+    fuse = (
+        detrend == "constant"
+        and window is not None
+        and isinstance(da.data, np.ndarray)
+        and np.issubdtype(da.dtype, np.inexact)
+    )
+    if fuse:
+        # the mean is subtracted as the window is applied, in a single pass
+        # over the data. Like DataArray.mean, the mean skips NaNs, though only
+        # the slabs which contain any need the slower nanmean.
+        mean = da.data.mean(axis=tuple(axis_num), keepdims=True)
+        if np.isnan(mean).any():
+            mean = np.nanmean(da.data, axis=tuple(axis_num), keepdims=True)
+        windows = _windows(da, dim, window_type=window)[1]
+        da = _window_data(da, dim, windows, offset=mean)
+        owned = True
+
+    if detrend is not None and not fuse:
         if detrend == "linear":
             orig_dims = da.dims
             da = _detrend(da, dim, detrend_type=detrend).transpose(*orig_dims)
         else:
             da = _detrend(da, dim, detrend_type=detrend)
+        owned = True
 
-    if window is not None:
-        _, da = _apply_window(da, dim, window_type=window)
+    if window is not None and not fuse:
+        windows = _windows(da, dim, window_type=window)[1]
+        da = _window_data(da, dim, windows, copy=not owned)
+        owned = True
+
+    k = _freq(N, delta_x, real_dim, shift)
 
     if true_phase:
         reversed_axis = [
             da.get_axis_num(d) for d in dim if da[d][-1] < da[d][0]
         ]  # handling decreasing coordinates
-        f = fft_fn(
-            fftm.ifftshift(np.flip(da, axis=reversed_axis), axes=axis_num),
-            axes=axis_num,
-        )
+        x = np.flip(da.data, axis=reversed_axis)
+        # The ifftshift of the input and the fftshift of the output are not
+        # applied as such, which would copy the whole array twice. The fftshift
+        # becomes a modulation of the input, and both shifts contribute a factor
+        # to the output which is folded into the phase ramp.
+        if shift:
+            x = _multiply_along_axes(
+                x, [_half_roll_factor(n) for n in N], axis_num, copy=not owned
+            )
+        with _fft_backend_context(fftm):
+            f = fft_fn(
+                x, axes=axis_num, **_fft_kwargs(fftm, overwrite_x=shift or owned)
+            )
+        phase = [
+            _phase_ramp(n, float(dx), float(lag), shift, d == real_dim)
+            for n, dx, lag, d in zip(N, delta_x, lag_x, dim)
+        ]
+        f = _multiply_along_axes(f, phase, axis_num, copy=False)
     else:
-        f = fft_fn(da.data, axes=axis_num)
-
-    if shift:
-        f = fftm.fftshift(f, axes=axis_num)
+        x = da.data
+        if shift:
+            # the fftshift of the output is a modulation of the input
+            x = _multiply_along_axes(
+                x, [_half_roll_factor(n) for n in N], axis_num, copy=not owned
+            )
+        with _fft_backend_context(fftm):
+            f = fft_fn(
+                x, axes=axis_num, **_fft_kwargs(fftm, overwrite_x=shift or owned)
+            )
 
-    k = _freq(N, delta_x, real_dim, shift)
+    if true_amplitude:
+        # f is a new array, unless it is dask-backed
+        if isinstance(f, np.ndarray):
+            f *= np.prod(delta_x)
+        else:
+            f = f * np.prod(delta_x)
 
     newcoords, swap_dims = _new_dims_and_coords(da, dim, k, prefix)
-    daft = xr.DataArray(
-        f, dims=da.dims, coords=dict([c for c in da.coords.items() if c[0] not in dim])
-    )
-    daft = daft.swap_dims(swap_dims).assign_coords(newcoords)
-    daft = daft.drop([d for d in dim if d in daft.coords])
-
-    updated_dims = [
-        daft.dims[i] for i in da.get_axis_num(dim)
-    ]  # List of transformed dimensions
-
     if true_phase:
-        for up_dim, lag in zip(updated_dims, lag_x):
-            daft = daft * xr.DataArray(
-                np.exp(-1j * 2.0 * np.pi * newcoords[up_dim] * lag),
-                dims=up_dim,
-                coords={up_dim: newcoords[up_dim]},
-            )  # taking advantage of xarray broadcasting and ordered coordinates
-            daft[up_dim].attrs.update({"direct_lag": lag})
-
-    if true_amplitude:
-        daft = daft * np.prod(delta_x)
+        for d, lag in zip(dim, lag_x):
+            newcoords[swap_dims[d]].attrs.update({"direct_lag": lag})
+    daft = _wrap_transform(f, da, dim, newcoords, swap_dims)
 
-    return daft.transpose(
-        *[swap_dims.get(d, d) for d in rawdims]
-    )  # Do nothing if da was not transposed
+    if da.dims != rawdims:
+        daft = daft.transpose(*[swap_dims.get(d, d) for d in rawdims])
+    return daft
 
 
 def ifft(
@@ -573,23 +1012,28 @@ def ifft(
         ]  # enable lag of the form [3.2, None, 7]
 
     if true_phase:
-        for d, l in zip(dim, lag):
-            daft = daft * np.exp(1j * 2.0 * np.pi * daft[d] * l)
+        phase = [
+            _inverse_phase_ramp(k.tobytes(), k.dtype.str, float(l))
+            for k, l in zip([daft[d].values for d in dim], lag)
+        ]
+        daft = daft.copy(
+            data=_multiply_along_axes(daft.data, phase, daft.get_axis_num(dim))
+        )
 
     if chunks_to_segments:
         daft = _stack_chunks(daft, dim)
 
     rawdims = daft.dims  # take care of segmented dimensions, if any
 
-    if real_dim is not None:
+    if real_dim is not None and daft.dims[-1] != real_dim:
         daft = daft.transpose(*move_to_end(daft.dims, real_dim))
 
     fftm = _fft_module(daft)
 
     if real_dim is None:
-        fft_fn = fftm.ifftn
+        fft_fn = _fft_function(daft, "ifftn")
     else:
-        fft_fn = fftm.irfftn
+        fft_fn = _fft_function(daft, "irfftn")
 
     # the axes along which to take ffts
     axis_num = [daft.get_axis_num(d) for d in dim]
@@ -597,7 +1041,7 @@ def ifft(
     N = [daft.shape[n] for n in axis_num]
 
     daft = daft.sortby(dim)  # sort by coordinates to handle fftshifted grids
-    delta_x = [_get_coordinate_spacing(daft[d], spacing_tol) for d in dim]
+    delta_x = [_coordinate_spacing_and_lag(daft[d], spacing_tol)[0] for d in dim]
     for d in dim:
         l = _lag_coord(daft[d]) if d is not real_dim else daft[d][0].data
         if np.abs(l) > spacing_tol:
@@ -606,31 +1050,51 @@ def ifft(
                 % d
             )
 
-    axis_shift = [
-        daft.get_axis_num(d) for d in dim if d is not real_dim
-    ]  # remove real dim of the list
-
-    f = fftm.ifftshift(
-        daft.data, axes=axis_shift
-    )  # Force to be on fftshift grid before Fourier Transform
-    f = fft_fn(f, axes=axis_num)
-
-    if not true_phase:
-        f = fftm.ifftshift(f, axes=axis_num)
-
-    if shift:
-        f = fftm.fftshift(f, axes=axis_num)
+    # The input is on an fftshifted grid, except along the real dimension, and
+    # the output is ifftshifted unless true_phase and fftshifted if shift.
+    # None of these shifts is applied as such: the ifftshift of the input is a
+    # factor of the output, and the shifts of the output, a roll by r samples,
+    # are modulations of the input.
+    M = [2 * (n - 1) if d == real_dim else n for n, d in zip(N, dim)]
+    roll = [(m // 2 if shift else 0) - (0 if true_phase else m // 2) for m in M]
+    # Along odd length axes of a real transform, a factor of the output would
+    # break the Hermitian symmetry assumed by irfftn, so the input is rolled.
+    rolled = [
+        d != real_dim and real_dim is not None and n % 2 == 1 for n, d in zip(N, dim)
+    ]
+    modulated = any(roll) or any(rolled)
+    f = daft.data
+    if any(rolled):
+        f = fftm.ifftshift(f, axes=[ax for ax, r in zip(axis_num, rolled) if r])
+    if any(roll):
+        f = _multiply_along_axes(
+            f,
+            [
+                np.conj(_half_roll_factor(m, n)) if r > 0 else _half_roll_factor(m, n)
+                for n, m, r in zip(N, M, roll)
+                if r
+            ],
+            [ax for ax, r in zip(axis_num, roll) if r],
+        )
+    with _fft_backend_context(fftm):
+        f = fft_fn(
+            f, axes=axis_num, **_fft_kwargs(fftm, overwrite_x=modulated or true_phase)
+        )
+    f = _multiply_along_axes(
+        f,
+        [
+            np.roll(np.conj(_half_roll_factor(n)), r)
+            for n, r, d, rl in zip(N, roll, dim, rolled)
+            if d != real_dim and not rl
+        ],
+        [ax for ax, d, rl in zip(axis_num, dim, rolled) if d != real_dim and not rl],
+        copy=False,
+    )
 
     k = _ifreq(N, delta_x, real_dim, shift)
 
     newcoords, swap_dims = _new_dims_and_coords(daft, dim, k, prefix)
-    da = xr.DataArray(
-        f,
-        dims=daft.dims,
-        coords=dict([c for c in daft.coords.items() if c[0] not in dim]),
-    )
-    da = da.swap_dims(swap_dims).assign_coords(newcoords)
-    da = da.drop([d for d in dim if d in da.coords])
+    da = _wrap_transform(f, daft, dim, newcoords, swap_dims)
 
     with xr.set_options(
         keep_attrs=True
@@ -652,11 +1116,12 @@ def _window_correction_factor(da, dim, scaling, window):
         raise ValueError(
             "window_correction can only be applied when windowing is turned on."
         )
-    windows, _ = _apply_window(da, dim, window_type=window)
+    # the windows are separable, so are the means of their product
+    _, windows = _windows(da, dim, window_type=window)
     if scaling == "density":
-        return (windows**2).mean()
+        return np.prod([(w**2).mean() for w in windows])
     elif scaling == "spectrum":
-        return windows.mean() ** 2
+        return np.prod([w.mean() for w in windows]) ** 2
     else:
         raise ValueError("Unknown {} scaling flag".format(scaling))
 
@@ -683,6 +1148,85 @@ def _psd_real_dim_scaling(da, ps, real_dim, updated_dims):
     return xr.DataArray(f, dims=real, coords=ps[real].coords)
 
 
+def _spectrum_scaling(da, daft, dim, real_dim, scaling, window_correction, window):
+    """
+    Scaling of the spectrum of da as a scalar and 1D factors along axes of daft.
+    """
+    updated_dims = [
+        d for d in daft.dims if (d not in da.dims and "segment" not in d)
+    ]  # Transformed dimensions
+    scale, factors, axes = 1.0, [], []
+
+    if real_dim is not None:
+        f = _psd_real_dim_scaling(da, daft, real_dim, updated_dims)
+        factors.append(f.values)
+        axes.append(daft.get_axis_num(f.dims[0]))
+
+    if scaling != "false_density":  # Corresponds to density=False
+        if window_correction:
+            scale /= _window_correction_factor(da, dim, scaling, window)
+        scale *= _psd_scaling_factor(daft, updated_dims, scaling)
+
+    return scale, factors, axes
+
+
+if numba is not None:
+
+    @numba.njit(parallel=True, fastmath={"reassoc", "contract", "arcp"}, cache=True)
+    def _conj_product_numba(a, b, scale, out):
+        for i in numba.prange(a.size):
+            out[i] = a[i] * np.conj(b[i]) * scale
+
+
+def _spectral_product(f1, f2, scale, factors, axes):
+    """
+    ``f1 * conj(f2)``, or ``|f1|**2`` if ``f2`` is None, multiplied by ``scale``
+    and by the 1D ``factors`` along ``axes``. With numexpr, all of it is
+    evaluated in a single pass over the data.
+    """
+    real_dtype = np.zeros((), f1.dtype).real.dtype
+    factors = [np.asarray(fac, real_dtype) for fac in factors]
+    arrays = [f1] if f2 is None else [f1, f2]
+
+    if (
+        numba is not None
+        and f2 is not None
+        and not factors
+        and all(isinstance(a, np.ndarray) and a.flags.c_contiguous for a in arrays)
+        and f1.dtype == f2.dtype
+    ):
+        # single pass, without the intermediate conjugate of f2
+        out = np.empty_like(f1)
+        _conj_product_numba(
+            f1.reshape(-1), f2.reshape(-1), real_dtype.type(scale), out.reshape(-1)
+        )
+        return out
+
+    if numexpr is not None and all(
+        isinstance(a, np.ndarray) and a.dtype == np.complex128 for a in arrays
+    ):
+        names = ["f%d" % i for i in range(len(factors))]
+        local_dict = {
+            n: np.reshape(fac, [-1 if i == ax else 1 for i in range(f1.ndim)])
+            for n, fac, ax in zip(names, factors, axes)
+        }
+        local_dict.update({"a": f1, "b": f2, "s": scale})
+        product = "real(a)**2 + imag(a)**2" if f2 is None else "a * conj(b)"
+        return numexpr.evaluate(
+            " * ".join(["(%s)" % product, "s"] + names), local_dict=local_dict
+        )
+
+    if f2 is None:
+        p = f1.real * f1.real + f1.imag * f1.imag
+    else:
+        p = f1 * np.conj(f2)
+    if isinstance(p, np.ndarray):
+        p *= scale
+    else:
+        p = p * scale
+    return _multiply_along_axes(p, factors, axes, copy=False)
+
+
 def power_spectrum(
     da, dim=None, real_dim=None, scaling="density", window_correction=False, **kwargs
 ):
@@ -730,25 +1274,31 @@ def power_spectrum(
         real_dim = kwargs.get("real")
         warnings.warn(_real_flag_warning, FutureWarning)
 
-    kwargs.update(
-        {"true_amplitude": True, "true_phase": False}
-    )  # true_phase do not matter in power_spectrum
+    daft, scale, factors, axes = _power_spectrum_terms(
+        da, dim, real_dim, scaling, window_correction, **kwargs
+    )
+    ps = daft.copy(data=_spectral_product(daft.data, None, scale, factors, axes))
 
-    daft = fft(da, dim=dim, real_dim=real_dim, **kwargs)
-    updated_dims = [
-        d for d in daft.dims if (d not in da.dims and "segment" not in d)
-    ]  # Transformed dimensions
-    ps = np.abs(daft) ** 2
+    return ps
 
-    if real_dim is not None:
-        ps *= _psd_real_dim_scaling(da, ps, real_dim, updated_dims)
 
-    if scaling != "false_density":  # Corresponds to density=False
-        if window_correction:
-            ps /= _window_correction_factor(da, dim, scaling, kwargs.get("window"))
-        ps *= _psd_scaling_factor(ps, updated_dims, scaling)
+def _power_spectrum_terms(
+    da, dim, real_dim, scaling, window_correction, half_dim=None, **kwargs
+):
+    """
+    Fourier transform of da and scaling of its power spectrum, see
+    _spectrum_scaling. If half_dim is given, the real transform is taken along
+    half_dim without scaling the spectrum for its missing half.
+    """
+    kwargs.update(
+        {"true_amplitude": True, "true_phase": False}
+    )  # true_phase do not matter in power_spectrum
 
-    return ps
+    daft = fft(da, dim=dim, real_dim=half_dim or real_dim, **kwargs)
+    scale, factors, axes = _spectrum_scaling(
+        da, daft, dim, real_dim, scaling, window_correction, kwargs.get("window")
+    )
+    return (daft, scale, factors, axes)
 
 
 def cross_spectrum(
@@ -815,23 +1365,21 @@ def cross_spectrum(
     kwargs.update({"true_amplitude": True})
 
     daft1 = fft(da1, dim=dim, real_dim=real_dim, true_phase=true_phase, **kwargs)
-    daft2 = fft(da2, dim=dim, real_dim=real_dim, true_phase=true_phase, **kwargs)
+    if da2 is da1:
+        daft2 = daft1
+    else:
+        daft2 = fft(da2, dim=dim, real_dim=real_dim, true_phase=true_phase, **kwargs)
 
     if daft1.dims != daft2.dims:
         raise ValueError("The two datasets have different dimensions")
 
-    updated_dims = [
-        d for d in daft1.dims if (d not in da1.dims and "segment" not in d)
-    ]  # Transformed dimensions
-    cs = daft1 * np.conj(daft2)
-
-    if real_dim is not None:
-        cs *= _psd_real_dim_scaling(da1, cs, real_dim, updated_dims)
-
-    if scaling != "false_density":  # Corresponds to density=False
-        if window_correction:
-            cs /= _window_correction_factor(da1, dim, scaling, kwargs.get("window"))
-        cs *= _psd_scaling_factor(cs, updated_dims, scaling)
+    daft1, daft2 = xr.align(daft1, daft2)
+    scale, factors, axes = _spectrum_scaling(
+        da1, daft1, dim, real_dim, scaling, window_correction, kwargs.get("window")
+    )
+    cs = daft1.copy(
+        data=_spectral_product(daft1.data, daft2.data, scale, factors, axes)
+    )
 
     return cs
 
@@ -875,75 +1423,125 @@ def cross_phase(da1, da2, dim=None, true_phase=True, **kwargs):
     return cp
 
 
-def _binned_agg(
-    array: np.ndarray,
-    indices: np.ndarray,
-    num_bins: int,
-    *,
-    func,
-    fill_value,
-    dtype,
-) -> np.ndarray:
-    """NumPy helper function for aggregating over bins."""
-
-    try:
-        import numpy_groupies
-    except ImportError:
-        raise ImportError(
-            "This function requires the `numpy_groupies` package to be installed. Please install it with pip or conda."
-        )
+def _radial_bins(freq_r, nbins):
+    """
+    Integer bin of each radial wavenumber and the number of wavenumbers per bin.
+    Bins are the same as ``pandas.cut(freq_r.ravel(), nbins)``.
+    """
+    freq_r = np.ravel(freq_r)
+    mn, mx = freq_r.min(), freq_r.max()
+    edges = np.linspace(mn, mx, nbins + 1)
+    edges[0] -= (mx - mn) * 0.001
+    indices = np.digitize(freq_r, edges, right=True) - 1
+    return indices, np.bincount(indices, minlength=nbins)
+
+
+if numba is not None:
+    # NaNs must still propagate through the sums, so "nnan" is left out
+    # If power, the squared magnitudes of rows are summed instead of rows.
+    # Complex rows are read as they are, interleaved: the loops are bound by
+    # the scatter into the bins, and copying the real and imaginary parts
+    # into separate arrays first costs more than it saves.
+    @numba.njit(parallel=True, fastmath={"reassoc", "contract", "arcp"}, cache=True)
+    def _binned_sum_numba(rows, indices, power, out):
+        for b in numba.prange(rows.shape[0]):
+            if power:
+                for j in range(rows.shape[1]):
+                    v = rows[b, j]
+                    out[b, indices[j]] += v.real * v.real + v.imag * v.imag
+            else:
+                for j in range(rows.shape[1]):
+                    out[b, indices[j]] += rows[b, j]
+
+    @numba.njit(parallel=True, fastmath={"reassoc", "contract", "arcp"}, cache=True)
+    def _binned_partial_sums_numba(rows, indices, power, out):
+        # every thread sums a part of each row into its own bins, without atomics
+        nparts, n = out.shape[1], rows.shape[1]
+        for p in numba.prange(nparts):
+            for b in range(rows.shape[0]):
+                if power:
+                    for j in range(p * n // nparts, (p + 1) * n // nparts):
+                        v = rows[b, j]
+                        out[b, p, indices[j]] += v.real * v.real + v.imag * v.imag
+                else:
+                    for j in range(p * n // nparts, (p + 1) * n // nparts):
+                        out[b, p, indices[j]] += rows[b, j]
+
+
+def _binned_sums(rows, indices, nbins, power=False):
+    """
+    Sums of each of the ``rows``, or of their squared magnitudes if ``power``,
+    over the bins ``indices``.
+    """
+    xp = np
+    if _is_cupy(rows):
+        # cupy.bincount scatter-adds on the GPU with atomics
+        import cupy
+
+        xp, indices = cupy, cupy.asarray(indices)
+
+    def _binned_sum(values):
+        # a single bincount over all the rows, each row with its own bins
+        offsets = nbins * xp.arange(values.shape[0])[:, np.newaxis]
+        return xp.bincount(
+            (indices + offsets).ravel(),
+            weights=values.ravel(),
+            minlength=values.shape[0] * nbins,
+        ).reshape((values.shape[0], nbins))
+
+    if numba is not None and xp is np:
+        # single pass over the spectrum, parallel over the batch of rows or, if
+        # there are too few rows to keep all the threads busy, over parts of rows
+        rows = np.ascontiguousarray(rows)
+        dtype = np.result_type(rows, np.float64)
+        nthreads = numba.get_num_threads()
+        if rows.shape[0] >= nthreads:
+            sums = np.zeros((rows.shape[0], nbins), dtype)
+            _binned_sum_numba(rows, indices, power, sums)
+        else:
+            sums = np.zeros((rows.shape[0], nthreads, nbins), dtype)
+            _binned_partial_sums_numba(rows, indices, power, sums)
+            sums = sums.sum(axis=1)
+        if power:
+            sums = sums.real
+    elif power:
+        sums = _binned_sum(rows.real * rows.real + rows.imag * rows.imag)
+    else:
+        sums = _binned_sum(rows.real)
+        if np.iscomplexobj(rows):
+            sums = sums + 1j * _binned_sum(rows.imag)
+    return sums
 
-    mask = np.logical_not(np.isnan(indices))
-    int_indices = indices[mask].astype(int)
-    shape = array.shape[: -indices.ndim] + (num_bins,)
-    result = numpy_groupies.aggregate(
-        int_indices,
-        array[..., mask],
-        func=func,
-        size=num_bins,
-        fill_value=fill_value,
-        dtype=dtype,
-        axis=-1,
-    )
-    return result
 
+def _binned_mean(array, indices, counts, scale=1.0, power=False, unmirrored=None):
+    """
+    Average ``array``, or its squared magnitude if ``power``, over the bins
+    ``indices`` of its last ``indices.ndim`` axes, and multiply the averages by
+    ``scale`` (a scalar or one value per bin). Empty bins are set to zero.
 
-def _groupby_bins_agg(
-    array: xr.DataArray,
-    group: xr.DataArray,
-    bins,
-    func="sum",
-    fill_value=0,
-    dtype=None,
-    **cut_kwargs,
-) -> xr.DataArray:
-    """Faster equivalent of Xarray's groupby_bins(...).sum()."""
-    # https://github.com/pydata/xarray/issues/4473
-    binned = pd.cut(np.ravel(group), bins, **cut_kwargs)
-    new_dim_name = group.name + "_bins"
-    indices = group.copy(data=binned.codes.reshape(group.shape))
-
-    result = xr.apply_ufunc(
-        _binned_agg,
-        array,
-        indices,
-        input_core_dims=[indices.dims, indices.dims],
-        output_core_dims=[[new_dim_name]],
-        output_dtypes=[array.dtype],
-        dask_gufunc_kwargs=dict(
-            allow_rechunk=True,
-            output_sizes={new_dim_name: binned.categories.size},
-        ),
-        kwargs={
-            "num_bins": binned.categories.size,
-            "func": func,
-            "fill_value": fill_value,
-            "dtype": dtype,
-        },
-        dask="parallelized",
+    If ``unmirrored`` is given, the last axis of ``array`` only holds half of a
+    Hermitian spectrum. Every column then also stands for its mirror, except
+    for the ``unmirrored`` columns, which are their own mirror.
+    """
+    nbins = counts.size
+    batch_shape = array.shape[: array.ndim - indices.ndim]
+    sums = _binned_sums(
+        array.reshape((-1, indices.size)), indices.ravel(), nbins, power
     )
-    result.coords[new_dim_name] = binned.categories
-    return result
+    if unmirrored is not None:
+        edge_indices = indices[..., unmirrored]
+        edges = array[..., unmirrored].reshape((-1, edge_indices.size))
+        sums *= 2
+        sums -= _binned_sums(edges, edge_indices.ravel(), nbins, power)
+    # the normalization by the counts and the scaling share a single pass
+    norm = np.divide(scale, counts, out=np.zeros(nbins), where=counts > 0)
+    if _is_cupy(sums):
+        import cupy
+
+        norm = cupy.asarray(norm)
+    sums *= norm
+    dtype = np.result_type(array.real.dtype if power else array.dtype, np.float32)
+    return sums.astype(dtype, copy=False).reshape(batch_shape + (nbins,))
 
 
 def isotropize(ps, fftdim, nfactor=4, truncate=True, complx=False):
@@ -971,53 +1569,132 @@ def isotropize(ps, fftdim, nfactor=4, truncate=True, complx=False):
     complx : bool, optional
         If True, isotropize allows for complex numbers.
     """
+    return _isotropize(ps, fftdim, nfactor=nfactor, truncate=truncate, complx=complx)
+
+
+# each entry holds a bin index per wavenumber, so only a few grids are kept
+@ft.lru_cache(maxsize=4)
+def _radial_grid(k, k_dtype, l, l_dtype, nbins, half_size):
+    """
+    Radial bins of the wavenumbers k and l (given as the bytes of arrays of
+    types k_dtype and l_dtype) as returned by _radial_bins, columns of a half
+    spectrum without mirror (see _binned_mean), mean radial wavenumber of the
+    bins and largest wavenumber along both axes. The arrays are read-only, and
+    the bins are stored in the smallest integer type which holds nbins.
+    """
+    k = np.frombuffer(k, dtype=k_dtype)
+    l = np.frombuffer(l, dtype=l_dtype)
+    freq_r = np.sqrt(l[:, np.newaxis] ** 2 + k**2)
+    indices, counts = _radial_bins(freq_r, nbins)
+    indices = indices.reshape(freq_r.shape).astype(np.min_scalar_type(nbins))
+    kmax = float(k.max())
+    unmirrored = None
+    if half_size is not None:
+        # the zero and Nyquist frequencies have no negative counterpart
+        unmirrored = (0,) if half_size % 2 else (0, k.size - 1)
+        counts = 2 * counts - np.bincount(
+            indices[:, unmirrored].ravel(), minlength=nbins
+        )
+        if half_size % 2 == 0:
+            kmax = float(k[-2])
+    kr = _binned_mean(freq_r, indices, counts, unmirrored=unmirrored)
+    indices, counts, kr = _read_only([indices, counts, kr])
+    return indices, counts, unmirrored, kr, min(kmax, float(l.max()))
+
+
+def _isotropize(
+    ps,
+    fftdim,
+    nfactor=4,
+    truncate=True,
+    complx=False,
+    power=False,
+    scale=1.0,
+    half_size=None,
+):
+    """
+    isotropize, optionally of the squared magnitude of ``ps`` (if ``power``) and
+    with the spectrum multiplied by ``scale``, both within the binning pass.
+    If ``half_size`` is given, ps is the half spectrum of the real transform of
+    an array of length half_size along fftdim[1].
+    """
 
     # compute radial wavenumber bins
-    k = ps[fftdim[1]]
-    l = ps[fftdim[0]]
+    k = ps[fftdim[1]].values
+    l = ps[fftdim[0]].values
 
-    N = [k.size, l.size]
+    N = [k.size if half_size is None else half_size, l.size]
     nbins = int(min(N) / nfactor)
-    freq_r = np.sqrt(k**2 + l**2).rename("freq_r")
-    kr = _groupby_bins_agg(freq_r, freq_r, bins=nbins, func="mean")
+    indices, counts, unmirrored, kr, kmax = _radial_grid(
+        k.tobytes(), k.dtype.str, l.tobytes(), l.dtype.str, nbins, half_size
+    )
 
     if truncate:
-        if k.max() > l.max():
-            kmax = l.max()
-        else:
-            kmax = k.max()
-        kr = kr.where(kr <= kmax)
+        kr = np.where(kr <= kmax, kr, np.nan)
     else:
         msg = "Isotropic wavenumber larger than the " + "Nyquist wavenumber may result."
         warnings.warn(msg, FutureWarning)
 
-    if complx:
-        iso_ps = (
-            (
-                _groupby_bins_agg(
-                    ps, freq_r, bins=nbins, func="mean", dtype=np.complex128
-                )
-                .rename({"freq_r_bins": "freq_r"})
-                .drop_vars("freq_r")
-            )
-            * 2
-            * np.pi
-        )
-    else:
-        iso_ps = (
-            (
-                _groupby_bins_agg(ps, freq_r, bins=nbins, func="mean")
-                .rename({"freq_r_bins": "freq_r"})
-                .drop_vars("freq_r")
-            )
-            * 2
-            * np.pi
-        )
-    iso_ps.coords["freq_r"] = kr.data
+    dtype = np.zeros((), ps.dtype).real.dtype if power else ps.dtype
+    dtype = np.result_type(dtype, np.complex64 if complx else np.float32)
+    core_dims = [fftdim[0], fftdim[1]]
+    # the 2 pi k_r factor is applied together with the normalization of the bins
+    kwargs = {
+        "indices": indices,
+        "counts": counts,
+        "scale": 2 * np.pi * scale * kr,
+        "power": power,
+        "unmirrored": unmirrored,
+    }
+
+    if ps.chunks is not None:
+        iso_ps = xr.apply_ufunc(
+            _binned_mean,
+            ps,
+            input_core_dims=[core_dims],
+            output_core_dims=[["freq_r"]],
+            output_dtypes=[dtype],
+            dask_gufunc_kwargs=dict(
+                allow_rechunk=True,
+                output_sizes={"freq_r": nbins},
+            ),
+            kwargs=kwargs,
+            dask="parallelized",
+        ).astype(dtype, copy=False)
+        iso_ps.coords["freq_r"] = kr
+        if truncate:
+            return iso_ps.dropna("freq_r")
+        else:
+            return iso_ps
+
+    # in memory, the spectrum is binned and truncated as a plain array, which is
+    # wrapped in a DataArray once
+    other_dims = [d for d in ps.dims if d not in core_dims]
+    data = np.moveaxis(ps.data, [ps.get_axis_num(d) for d in core_dims], [-2, -1])
+    iso = _binned_mean(data, **kwargs).astype(dtype, copy=False)
     if truncate:
-        return (iso_ps * iso_ps.freq_r).dropna("freq_r")
-    else:
-        return iso_ps * iso_ps.freq_r
+        keep = ~np.isnan(iso.reshape((-1, nbins))).any(axis=0)
+        if _is_cupy(keep):
+            keep = keep.get()
+        iso, kr = iso[..., keep], kr[keep]
+    coords = {
+        name: coord.variable
+        for name, coord in ps.coords.items()
+        if not set(coord.dims) & set(core_dims)
+    }
+    coords["freq_r"] = kr
+    return xr.DataArray(iso, dims=other_dims + ["freq_r"], coords=coords, name=ps.name)
+
+
+def _rechunk_batches(da, dim):
+    """
+    Rechunk a dask-backed DataArray to a single chunk along dim, and to
+    batches of similar sizes along the other dimensions, which are then
+    transformed and binned in parallel.
+    """
+    if da.chunks is None or all(len(da.chunks[da.get_axis_num(d)]) == 1 for d in dim):
+        return da
+    return da.chunk({d: -1 if d in dim else "auto" for d in da.dims})
 
 
 def isotropic_power_spectrum(
@@ -1056,7 +1733,8 @@ def isotropic_power_spectrum(
         The dimensions along which to take the transformation. If `None`, all
         dimensions will be transformed.
     shift : bool, optional
-        Whether to shift the fft output.
+        Has no effect: the azimuthal average does not depend on the order of
+        the frequencies, so the fft output is never shifted.
     detrend : str, optional
         If `constant`, the mean across the transform dimensions will be
         subtracted before calculating the Fourier transform (FT).
@@ -1088,21 +1766,58 @@ def isotropic_power_spectrum(
     if len(dim) != 2:
         raise ValueError("The Fourier transform should be two dimensional")
 
-    ps = power_spectrum(
+    if not kwargs.get("chunks_to_segments"):
+        da = _rechunk_batches(da, dim)
+    # with the transformed dimensions last, all the other dimensions form a
+    # batch of contiguous 2D transforms and averages
+    da = da.transpose(..., *dim)
+
+    if "real" in kwargs:
+        kwargs["real_dim"] = kwargs.pop("real")
+        warnings.warn(_real_flag_warning, FutureWarning)
+
+    real_dim = kwargs.pop("real_dim", None)
+    # The spectrum of real data is Hermitian, so only its non-negative
+    # frequencies along the last dimension are computed and binned.
+    half_dim = dim[-1] if real_dim is None and da.dtype.kind != "c" else None
+
+    daft, scale, factors, axes = _power_spectrum_terms(
         da,
+        dim,
+        real_dim,
+        scaling,
+        window_correction,
+        half_dim=half_dim,
         spacing_tol=spacing_tol,
-        dim=dim,
-        shift=shift,
+        shift=False,
         detrend=detrend,
-        scaling=scaling,
-        window_correction=window_correction,
         window=window,
         **kwargs,
     )
 
     fftdim = ["freq_" + d for d in dim]
 
-    return isotropize(ps, fftdim, nfactor=nfactor, truncate=truncate)
+    if factors:
+        ps = daft.copy(data=_spectral_product(daft.data, None, scale, factors, axes))
+        return isotropize(ps, fftdim, nfactor=nfactor, truncate=truncate)
+    # the length of the real transform, which is that of the segments if the
+    # chunks are transformed separately
+    if half_dim is None:
+        half_size = None
+    elif kwargs.get("chunks_to_segments"):
+        half_size = da.chunks[da.get_axis_num(half_dim)][0]
+    else:
+        half_size = da.sizes[half_dim]
+    # the squared magnitudes are computed as they are binned
+    return _isotropize(
+        daft,
+        fftdim,
+        nfactor=nfactor,
+        truncate=truncate,
+        power=True,
+        scale=scale,
+        half_size=half_size,
+    )
 
 
 def isotropic_cross_spectrum(
@@ -1144,7 +1859,8 @@ def isotropic_cross_spectrum(
         The dimensions along which to take the transformation. If `None`, all
         dimensions will be transformed.
     shift : bool (optional)
-        Whether to shift the fft output.
+        Has no effect: the azimuthal average does not depend on the order of
+        the frequencies, so the fft output is never shifted.
     detrend : str (optional)
         If `constant`, the mean across the transform dimensions will be
         subtracted before calculating the Fourier transform (FT).
@@ -1179,12 +1895,23 @@ def isotropic_cross_spectrum(
     if len(dim) != 2:
         raise ValueError("The Fourier transform should be two dimensional")
 
+    if not kwargs.get("chunks_to_segments"):
+        da1 = _rechunk_batches(da1, dim)
+        da2 = da1 if da2 is da1 else _rechunk_batches(da2, dim)
+    # with the transformed dimensions last, all the other dimensions form a
+    # batch of contiguous 2D transforms and averages
+    if da2 is da1:
+        da1 = da2 = da1.transpose(..., *dim)
+    else:
+        da1 = da1.transpose(..., *dim)
+        da2 = da2.transpose(..., *dim)
+
     cs = cross_spectrum(
         da1,
         da2,
         spacing_tol=spacing_tol,
         dim=dim,
-        shift=shift,
+        shift=False,
         detrend=detrend,
         scaling=scaling,
         window_correction=window_correction,
@@ -1217,8 +1944,19 @@ def fit_loglog(x, y):
     b : float64
         Intercept of the fit
     """
-    # fig log vs log
-    p = np.polyfit(np.log2(x), np.log2(y), 1)
-    y_fit = 2 ** (np.log2(x) * p[0] + p[1])
-
-    return y_fit, p[0], p[1]
+    # fit log vs log with the closed form of the least squares line, in
+    # natural logarithms; the slope does not depend on the base of the
+    # logarithm and the intercept is returned in base 2
+    lx = np.log(np.asarray(x))
+    ly = np.log(np.asarray(y))
+    dlx = lx - lx.mean()
+    a = (dlx * (ly - ly.mean())).sum() / (dlx * dlx).sum()
+    b = ly.mean() - a * lx.mean()
+    # log(x) is reused, which is cheaper than x**a, a log and an exp per value
+    y_fit = lx * a
+    y_fit += b
+    np.exp(y_fit, out=y_fit)
+    if isinstance(x, xr.DataArray):
+        y_fit = xr.DataArray(y_fit, dims=x.dims, coords=x.coords, name=x.name)
+
+    return y_fit, a, b / np.log(2)